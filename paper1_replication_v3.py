@@ -19,12 +19,29 @@ Required file:
     (Place in same directory or specify path)
 """
 
-import csv
+import contextlib
 import hashlib
+import io
+import mmap
 import os
 import sys
 import math
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
 
 # ═══════════════════════════════════════════════════════════════
 # CONFIGURATION
@@ -33,7 +50,15 @@ from collections import defaultdict
 IEG_FILE = "ieg_world_bank_project_performance_ratings_01-17-2026.csv"
 EXPECTED_MD5 = "5a13fbabd3f9e26698cb591aba560793"
 
-SIDS_COUNTRIES = [
+# The only columns the analysis reads; everything else stays unparsed
+USE_COLUMNS = [
+    'Outcome', 'Quality at Entry', 'Quality of Supervision', 'M&E Quality',
+    'Evaluation Type', 'Country / Economy', 'Global Practice', 'Practice Group',
+    'WB Region', 'Approval FY', 'Country / Economy Lending Group',
+    'Country / Economy FCS Status',
+]
+
+SIDS_COUNTRIES = frozenset([
     'Antigua and Barbuda', 'Bahamas, The', 'Barbados', 'Belize', 'Cabo Verde',
     'Comoros', 'Cuba', 'Dominica', 'Dominican Republic', 'Fiji',
     'Grenada', 'Guinea-Bissau', 'Guyana', 'Haiti', 'Jamaica',
@@ -46,26 +71,43 @@ SIDS_COUNTRIES = [
     # Common alternate spellings in WB data
     'Cape Verde', 'Saint Kitts and Nevis', 'Saint Lucia',
     'Saint Vincent and the Grenadines', 'Federated States of Micronesia',
-]
+])
 
-PACIFIC_COUNTRIES = [
+PACIFIC_COUNTRIES = frozenset([
     'Fiji', 'Kiribati', 'Marshall Islands', 'Micronesia, Fed. Sts.',
     'Nauru', 'Palau', 'Papua New Guinea', 'Samoa', 'Solomon Islands',
     'Timor-Leste', 'Tonga', 'Tuvalu', 'Vanuatu',
     'Federated States of Micronesia',
-]
+])
 
-# Rating classifications
-SAT_RATINGS = {'Highly Satisfactory', 'Satisfactory'}
-UNSAT_RATINGS = {'Highly Unsatisfactory', 'Unsatisfactory'}
-BROAD_SAT = {'Highly Satisfactory', 'Satisfactory', 'Moderately Satisfactory'}
-BROAD_UNSAT = {'Highly Unsatisfactory', 'Unsatisfactory', 'Moderately Unsatisfactory'}
+# Integer codes for the six-point rating scale. Every rating column is
+# decoded exactly once at load time, so the analysis steps compare small
+# ints instead of stripping and set-testing strings on every pass.
+# Missing cells are -1; 'Not Rated' (and any unrecognised value) is 0 so
+# it counts as present but neither satisfactory nor unsatisfactory.
+#   broad sat (MS/S/HS)    <=>  code >= 4    strict sat (S/HS)    <=>  code >= 5
+#   broad unsat (MU/U/HU)  <=>  1 <= code <= 3    strict unsat (U/HU)  <=>  1 <= code <= 2
+CODE_RATING = {
+    'Not Rated': 0,
+    'Highly Unsatisfactory': 1,
+    'Unsatisfactory': 2,
+    'Moderately Unsatisfactory': 3,
+    'Moderately Satisfactory': 4,
+    'Satisfactory': 5,
+    'Highly Satisfactory': 6,
+}
 
-# M&E quality levels
-ME_HIGH = {'High'}
-ME_SUBSTANTIAL = {'Substantial'}
-ME_MODEST = {'Modest'}
-ME_NEGLIGIBLE = {'Negligible'}
+# M&E codes double as the Tier-1 score contribution in Step 14
+# (High=5 ... Not Applicable=1); 'Not Rated' is 0, missing is -1.
+CODE_ME = {
+    'Not Rated': 0,
+    'Not Applicable': 1,
+    'Negligible': 2,
+    'Modest': 3,
+    'Modest ': 3,
+    'Substantial': 4,
+    'High': 5,
+}
 
 # ═══════════════════════════════════════════════════════════════
 # UTILITY FUNCTIONS
@@ -73,35 +115,123 @@ ME_NEGLIGIBLE = {'Negligible'}
 
 def md5_file(path):
     """Compute MD5 hash of a file."""
-    h = hashlib.md5()
     with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+        try:
+            # Python 3.11+: chunking happens in C with an optimal buffer
+            return hashlib.file_digest(f, 'md5').hexdigest()
+        except AttributeError:
+            h = hashlib.md5()
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+            return h.hexdigest()
 
 def odds_ratio(a, b, c, d):
     """
     Compute odds ratio and 95% CI from 2x2 table.
     a = success in group 1 (symbiotic success)
-    b = fail in group 1 (symbiotic fail)  
+    b = fail in group 1 (symbiotic fail)
     c = success in group 2 (extractive success)
     d = fail in group 2 (extractive fail)
     OR = (a*d) / (b*c)
+
+    Tables with any small cell (< 5) get the Haldane-Anscombe +0.5
+    correction, so zero cells yield a finite OR and CI instead of inf.
     """
-    if b == 0 or c == 0:
-        return float('inf'), float('inf'), float('inf')
+    if min(a, b, c, d) < 5:
+        a, b, c, d = a + 0.5, b + 0.5, c + 0.5, d + 0.5
     OR = (a * d) / (b * c)
     # Woolf's method for log-OR CI
-    se_ln = math.sqrt(1/a + 1/b + 1/c + 1/d) if min(a,b,c,d) > 0 else float('inf')
+    se_ln = math.sqrt(1/a + 1/b + 1/c + 1/d)
     ln_or = math.log(OR)
     ci_lo = math.exp(ln_or - 1.96 * se_ln)
     ci_hi = math.exp(ln_or + 1.96 * se_ln)
     return OR, ci_lo, ci_hi
 
+def odds_ratio_vec(a, b, c, d):
+    """Vectorised odds_ratio over parallel arrays of 2x2 counts.
+
+    Returns (OR, ci_lo, ci_hi) arrays for a whole group table in one
+    call; entries with any small cell get the same Haldane-Anscombe
+    +0.5 correction as the scalar function.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    d = np.asarray(d, dtype=np.float64)
+    small = np.minimum(np.minimum(a, b), np.minimum(c, d)) < 5
+    corr = np.where(small, 0.5, 0.0)
+    a, b, c, d = a + corr, b + corr, c + corr, d + corr
+    OR = (a * d) / (b * c)
+    se_ln = np.sqrt(1/a + 1/b + 1/c + 1/d)
+    ln_or = np.log(OR)
+    ci_lo = np.exp(ln_or - 1.96 * se_ln)
+    ci_hi = np.exp(ln_or + 1.96 * se_ln)
+    return OR, ci_lo, ci_hi
+
 def pct(num, denom):
     """Safe percentage."""
     return (num / denom * 100) if denom > 0 else 0.0
 
+def decode_rating(col, table):
+    """Decode a stripped categorical column to int8 codes.
+
+    Only the (small) category dictionary is mapped through `table`; the
+    per-row work is a single take. Empty cells are -1, unrecognised
+    values 0, matching the ingestion semantics elsewhere.
+    """
+    lut = np.array([table.get(v, 0) if v else -1 for v in col.cat.categories],
+                   dtype=np.int8)
+    return lut[col.cat.codes.to_numpy()]
+
+def intern_ids(col):
+    """Interned group ids straight from a categorical's dictionary.
+
+    Returns (ids, names); rows holding the empty string get id -1 so
+    they drop out of the group tallies, as missing values always have.
+    """
+    ids = col.cat.codes.to_numpy().astype(np.int16)
+    names = list(col.cat.categories)
+    if '' in names:
+        ids = np.where(ids == names.index(''), np.int16(-1), ids)
+    return ids, names
+
+def _group_tallies_py(ids, n_groups, hi_mask, lo_mask, sat_mask):
+    return (np.bincount(ids[hi_mask], minlength=n_groups),
+            np.bincount(ids[hi_mask & sat_mask], minlength=n_groups),
+            np.bincount(ids[lo_mask], minlength=n_groups),
+            np.bincount(ids[lo_mask & sat_mask], minlength=n_groups))
+
+if njit is not None:
+    @njit(cache=True)
+    def _group_tallies_jit(ids, n_groups, hi_mask, lo_mask, sat_mask):
+        high_total = np.zeros(n_groups, dtype=np.int64)
+        high_sat = np.zeros(n_groups, dtype=np.int64)
+        low_total = np.zeros(n_groups, dtype=np.int64)
+        low_sat = np.zeros(n_groups, dtype=np.int64)
+        for i in range(ids.shape[0]):
+            if hi_mask[i]:
+                g = ids[i]
+                high_total[g] += 1
+                if sat_mask[i]:
+                    high_sat[g] += 1
+            elif lo_mask[i]:
+                g = ids[i]
+                low_total[g] += 1
+                if sat_mask[i]:
+                    low_sat[g] += 1
+        return high_total, high_sat, low_total, low_sat
+
+def group_tallies(ids, n_groups, hi_mask, lo_mask, sat_mask):
+    """Per-group sat/total tallies for the strict-QE 2x2 tables.
+
+    hi_mask/lo_mask must already include group validity (id >= 0). With
+    numba installed the fused kernel makes a single pass over the id
+    array; otherwise four bincounts do the same work vectorised.
+    """
+    if njit is not None:
+        return _group_tallies_jit(ids, n_groups, hi_mask, lo_mask, sat_mask)
+    return _group_tallies_py(ids, n_groups, hi_mask, lo_mask, sat_mask)
+
 def print_section(title):
     print(f"\n{'='*70}")
     print(f"  {title}")
@@ -116,6 +246,21 @@ def print_result(label, value, note=""):
 # ═══════════════════════════════════════════════════════════════
 
 def main():
+    """Run the analysis with the whole report buffered in memory.
+
+    The steps emit hundreds of small prints; collecting them in a
+    StringIO and writing stdout once replaces that many line-buffered
+    syscalls with one. The flush also runs if the analysis exits early.
+    """
+    buf = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buf):
+            _analyze()
+    finally:
+        sys.stdout.write(buf.getvalue())
+
+
+def _analyze():
     # Find the data file
     paths_to_try = [
         IEG_FILE,
@@ -123,124 +268,207 @@ def main():
         f"/mnt/user-data/uploads/{IEG_FILE}",
         f"data/{IEG_FILE}",
     ]
-    
+
     data_path = None
     for p in paths_to_try:
         if os.path.exists(p):
             data_path = p
             break
-    
+
     if not data_path:
         print(f"ERROR: Cannot find {IEG_FILE}")
         print(f"Tried: {paths_to_try}")
         sys.exit(1)
-    
+
+    # Parsed-dataset cache: a Feather snapshot of the stripped,
+    # categorised frame, valid while it is newer than the source CSV.
+    # The .md5 sidecar lets fresh-cache runs skip rehashing the CSV.
+    cache_path = data_path + '.feather'
+    md5_path = data_path + '.md5'
+    src_mtime = os.path.getmtime(data_path)
+    cache_fresh = (os.path.exists(cache_path)
+                   and os.path.getmtime(cache_path) >= src_mtime)
+
+    # On a cache miss the CSV is memory-mapped once and the same buffer
+    # feeds both the MD5 below and the parser in Step 2, so the file is
+    # pulled off disk a single time.
+    csv_file = csv_mm = None
+    if not cache_fresh:
+        csv_file = open(data_path, 'rb')
+        csv_mm = mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ)
+
     # ── Step 1: Verify dataset integrity ──
     print_section("STEP 1: DATASET VERIFICATION")
-    
-    file_md5 = md5_file(data_path)
+
+    if csv_mm is not None:
+        file_md5 = hashlib.md5(csv_mm).hexdigest()
+        try:
+            with open(md5_path, 'w') as f:
+                f.write(file_md5 + '\n')
+        except OSError:
+            pass  # sidecar is best-effort (e.g. read-only data dir)
+    elif (os.path.exists(md5_path)
+            and os.path.getmtime(md5_path) >= src_mtime):
+        with open(md5_path) as f:
+            file_md5 = f.read().strip()
+    else:
+        file_md5 = md5_file(data_path)
+        try:
+            with open(md5_path, 'w') as f:
+                f.write(file_md5 + '\n')
+        except OSError:
+            pass  # sidecar is best-effort (e.g. read-only data dir)
     md5_match = file_md5 == EXPECTED_MD5
     print_result("File", data_path)
     print_result("MD5 (computed)", file_md5)
     print_result("MD5 (expected)", EXPECTED_MD5)
     print_result("MD5 MATCH", "✅ YES" if md5_match else "❌ NO")
-    
+
     # ── Step 2: Load data ──
+    # The multi-threaded PyArrow reader parses only the columns the
+    # analysis touches (pandas' C parser is the fallback); each column
+    # is categorised and only its (small) dictionary of unique values
+    # is stripped, so the decode helpers never touch individual cells.
     print_section("STEP 2: DATA LOADING")
-    
-    rows = []
-    with open(data_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-    
-    total = len(rows)
+
+    df = None
+    if cache_fresh:
+        try:
+            df = pd.read_feather(cache_path)
+        except Exception:
+            df = None  # unreadable cache; fall back to the CSV
+
+    if df is None:
+        # Reuse the mapped buffer from Step 1 where there is one (no
+        # second disk read); a fresh-looking cache that failed to load
+        # is the only case that falls back to the path.
+        if pa is not None:
+            source = pa.BufferReader(pa.py_buffer(csv_mm)) if (
+                csv_mm is not None) else data_path
+            table = pacsv.read_csv(
+                source,
+                read_options=pacsv.ReadOptions(use_threads=True),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=USE_COLUMNS,
+                    column_types={c: pa.string() for c in USE_COLUMNS}))
+            df = table.to_pandas()
+            del table, source  # release exported views of the mmap
+        else:
+            df = pd.read_csv(csv_mm if csv_mm is not None else data_path,
+                             encoding='utf-8-sig', engine='c',
+                             usecols=USE_COLUMNS, dtype=str)
+
+        cat_columns = ['Outcome', 'Quality at Entry', 'Quality of Supervision',
+                       'M&E Quality', 'Evaluation Type', 'Country / Economy',
+                       'Global Practice', 'Practice Group', 'WB Region',
+                       'Country / Economy Lending Group', 'Country / Economy FCS Status']
+        for c in cat_columns:
+            col = df[c].fillna('').astype('category')
+            stripped = col.cat.categories.str.strip()
+            if stripped.is_unique:
+                col = col.cat.rename_categories(stripped)
+            else:
+                # Stripped variants collide (e.g. 'Modest ' vs 'Modest'):
+                # remap through the dictionary and re-categorise
+                col = col.map(dict(zip(col.cat.categories, stripped))).astype('category')
+            df[c] = col
+
+        # Sector falls back from Global Practice to Practice Group
+        df['Sector'] = df['Global Practice'].astype(str).where(
+            df['Global Practice'] != '', df['Practice Group'].astype(str)).astype('category')
+
+        try:
+            df.to_feather(cache_path)
+        except Exception:
+            pass  # cache is best-effort (e.g. pyarrow not installed)
+
+    if csv_mm is not None:
+        csv_mm.close()
+        csv_file.close()
+
+    # Rating codes (int8, -1 = missing)
+    outcome = decode_rating(df['Outcome'], CODE_RATING)
+    qe = decode_rating(df['Quality at Entry'], CODE_RATING)
+    qos = decode_rating(df['Quality of Supervision'], CODE_RATING)
+    me = decode_rating(df['M&E Quality'], CODE_ME)
+
+    # Interned group ids (-1 = missing)
+    sector_col, sector_names = intern_ids(df['Sector'])
+    region_col, region_names = intern_ids(df['WB Region'])
+    lend_col, lend_names = intern_ids(df['Country / Economy Lending Group'])
+    fcs_col, fcs_names = intern_ids(df['Country / Economy FCS Status'])
+
+    # SIDS/Pacific membership, tested once per unique country
+    country = df['Country / Economy']
+    sids_lut = np.array([c in SIDS_COUNTRIES for c in country.cat.categories])
+    pac_lut = np.array([c in PACIFIC_COUNTRIES for c in country.cat.categories])
+    country_codes = country.cat.codes.to_numpy()
+    sids_flag = sids_lut[country_codes]
+    pac_flag = pac_lut[country_codes]
+
+    # Approval decade (e.g. 1990), parsed as one numeric cast over the
+    # whole column instead of per-row int()/except; -1 = unparseable
+    fy = pd.to_numeric(df['Approval FY'], errors='coerce')
+    fy = fy.fillna(-1).astype(np.int16).to_numpy()
+    decade_col = np.where(fy >= 0, (fy // 10) * 10, -1).astype(np.int16)
+
+    total = len(df)
+
+    # Step 3's distributions come off the frame here so it can be
+    # released: from this point the working set is structure-of-arrays,
+    # nothing but the typed columns above (empty strings are missing
+    # values, not a rating)
+    value_dists = {}
+    for column in ('Outcome', 'Quality at Entry', 'Quality of Supervision',
+                   'M&E Quality', 'Evaluation Type'):
+        value_dists[column] = {k: int(v) for k, v in df[column].value_counts().items() if k}
+    del df, country
+
     print_result("Total records loaded", f"{total:,}")
-    
+
     # ── Step 3: Examine column values ──
     print_section("STEP 3: COLUMN VALUE DISTRIBUTIONS")
-    
-    # Outcome ratings
-    outcome_counts = defaultdict(int)
-    for r in rows:
-        val = r.get('Outcome', '').strip()
-        if val:
-            outcome_counts[val] += 1
-    
-    print("\n  OUTCOME RATINGS:")
-    for rating in sorted(outcome_counts.keys()):
-        print(f"    {rating:<30} {outcome_counts[rating]:>5}")
-    
-    # QE ratings
-    qe_counts = defaultdict(int)
-    for r in rows:
-        val = r.get('Quality at Entry', '').strip()
-        if val:
-            qe_counts[val] += 1
-    
-    print("\n  QUALITY AT ENTRY RATINGS:")
-    for rating in sorted(qe_counts.keys()):
-        print(f"    {rating:<30} {qe_counts[rating]:>5}")
-    
-    # QoS ratings
-    qs_counts = defaultdict(int)
-    for r in rows:
-        val = r.get('Quality of Supervision', '').strip()
-        if val:
-            qs_counts[val] += 1
-    
-    print("\n  QUALITY OF SUPERVISION RATINGS:")
-    for rating in sorted(qs_counts.keys()):
-        print(f"    {rating:<30} {qs_counts[rating]:>5}")
-    
-    # M&E ratings
-    me_counts = defaultdict(int)
-    for r in rows:
-        val = r.get('M&E Quality', '').strip()
-        if val:
-            me_counts[val] += 1
-    
-    print("\n  M&E QUALITY RATINGS:")
-    for rating in sorted(me_counts.keys()):
-        print(f"    {rating:<30} {me_counts[rating]:>5}")
-    
-    # Eval types
-    eval_counts = defaultdict(int)
-    for r in rows:
-        val = r.get('Evaluation Type', '').strip()
-        if val:
-            eval_counts[val] += 1
-    
-    print("\n  EVALUATION TYPES:")
-    for etype in sorted(eval_counts.keys()):
-        print(f"    {etype:<30} {eval_counts[etype]:>5}")
-    
+
+    for column, heading in [('Outcome', 'OUTCOME RATINGS'),
+                            ('Quality at Entry', 'QUALITY AT ENTRY RATINGS'),
+                            ('Quality of Supervision', 'QUALITY OF SUPERVISION RATINGS'),
+                            ('M&E Quality', 'M&E QUALITY RATINGS'),
+                            ('Evaluation Type', 'EVALUATION TYPES')]:
+        counts = value_dists[column]
+        print(f"\n  {heading}:")
+        for value in sorted(counts):
+            print(f"    {value:<30} {counts[value]:>5}")
+
     # ── Step 4: Core statistics ──
     print_section("STEP 4: CORE STATISTICS")
-    
+
     # 4a: Overall success rate (Outcome = any satisfactory variant)
-    has_outcome = [r for r in rows if r.get('Outcome', '').strip()]
-    sat = [r for r in has_outcome if r['Outcome'].strip() in BROAD_SAT]
-    unsat = [r for r in has_outcome if r['Outcome'].strip() in BROAD_UNSAT]
-    rated = sat + unsat  # Only projects with clear sat/unsat
-    
-    n_rated = len(has_outcome)
-    n_sat = len(sat)
-    n_unsat_broad = len(unsat)
-    
+    # Computed once here, reused by every later step: presence of an
+    # Outcome rating, and broad-satisfactory outcome
+    has_outcome = outcome >= 0
+    is_sat = outcome >= 4
+
+    n_rated = int(has_outcome.sum())
+    n_sat = int(is_sat.sum())
+    n_unsat_broad = int(((outcome >= 1) & (outcome <= 3)).sum())
+
     print(f"\n  Projects with Outcome rating:    {n_rated:>6}")
     print(f"  Satisfactory (MS+S+HS):          {n_sat:>6} ({pct(n_sat, n_rated):.1f}%)")
     print(f"  Unsatisfactory (MU+U+HU):        {n_unsat_broad:>6} ({pct(n_unsat_broad, n_rated):.1f}%)")
     print(f"  Other/Missing:                   {total - n_rated:>6}")
-    
+
     # Break down sat/unsat
-    n_hs = sum(1 for r in has_outcome if r['Outcome'].strip() == 'Highly Satisfactory')
-    n_s = sum(1 for r in has_outcome if r['Outcome'].strip() == 'Satisfactory')
-    n_ms = sum(1 for r in has_outcome if r['Outcome'].strip() == 'Moderately Satisfactory')
-    n_mu = sum(1 for r in has_outcome if r['Outcome'].strip() == 'Moderately Unsatisfactory')
-    n_u = sum(1 for r in has_outcome if r['Outcome'].strip() == 'Unsatisfactory')
-    n_hu = sum(1 for r in has_outcome if r['Outcome'].strip() == 'Highly Unsatisfactory')
-    
+    # One histogram pass over the rated outcome codes instead of six
+    # separate scans (bincount is the array-column equivalent of a
+    # Counter here)
+    rating_hist = np.bincount(outcome[has_outcome], minlength=7)
+    n_hs = int(rating_hist[CODE_RATING['Highly Satisfactory']])
+    n_s = int(rating_hist[CODE_RATING['Satisfactory']])
+    n_ms = int(rating_hist[CODE_RATING['Moderately Satisfactory']])
+    n_mu = int(rating_hist[CODE_RATING['Moderately Unsatisfactory']])
+    n_u = int(rating_hist[CODE_RATING['Unsatisfactory']])
+    n_hu = int(rating_hist[CODE_RATING['Highly Unsatisfactory']])
+
     print(f"\n  Breakdown:")
     print(f"    Highly Satisfactory:           {n_hs:>6}")
     print(f"    Satisfactory:                  {n_s:>6}")
@@ -249,386 +477,263 @@ def main():
     print(f"    Unsatisfactory:                {n_u:>6}")
     print(f"    Highly Unsatisfactory:         {n_hu:>6}")
     print(f"    TOTAL rated:                   {n_hs+n_s+n_ms+n_mu+n_u+n_hu:>6}")
-    
+
     # ── Step 5: QE Analysis (Strict - S/HS vs U/HU) ──
     print_section("STEP 5: QUALITY AT ENTRY - STRICT ANALYSIS")
-    
-    has_qe_outcome = [r for r in rows 
-                      if r.get('Quality at Entry', '').strip() 
-                      and r.get('Outcome', '').strip()]
-    
+
     # Strict QE: only S/HS vs U/HU
-    qe_high = [r for r in has_qe_outcome if r['Quality at Entry'].strip() in SAT_RATINGS]
-    qe_low = [r for r in has_qe_outcome if r['Quality at Entry'].strip() in UNSAT_RATINGS]
-    
-    qe_high_sat = sum(1 for r in qe_high if r['Outcome'].strip() in BROAD_SAT)
-    qe_high_unsat = len(qe_high) - qe_high_sat
-    qe_low_sat = sum(1 for r in qe_low if r['Outcome'].strip() in BROAD_SAT)
-    qe_low_unsat = len(qe_low) - qe_low_sat
-    
-    qe_high_rate = pct(qe_high_sat, len(qe_high))
-    qe_low_rate = pct(qe_low_sat, len(qe_low))
+    qe_is_high = (qe >= 5) & has_outcome
+    qe_is_low = (qe >= 1) & (qe <= 2) & has_outcome
+    qe_high_n = int(qe_is_high.sum())
+    qe_low_n = int(qe_is_low.sum())
+
+    qe_high_sat = int((qe_is_high & is_sat).sum())
+    qe_high_unsat = qe_high_n - qe_high_sat
+    qe_low_sat = int((qe_is_low & is_sat).sum())
+    qe_low_unsat = qe_low_n - qe_low_sat
+
+    qe_high_rate = pct(qe_high_sat, qe_high_n)
+    qe_low_rate = pct(qe_low_sat, qe_low_n)
     qe_gap = qe_high_rate - qe_low_rate
-    
+
     OR_qe, ci_lo_qe, ci_hi_qe = odds_ratio(qe_high_sat, qe_high_unsat, qe_low_sat, qe_low_unsat)
-    
+
     print(f"\n  HIGH QE (S/HS):")
-    print(f"    n = {len(qe_high):,}")
-    print(f"    Success: {qe_high_sat:,} / {len(qe_high):,} = {qe_high_rate:.1f}%")
+    print(f"    n = {qe_high_n:,}")
+    print(f"    Success: {qe_high_sat:,} / {qe_high_n:,} = {qe_high_rate:.1f}%")
     print(f"\n  LOW QE (U/HU):")
-    print(f"    n = {len(qe_low):,}")
-    print(f"    Success: {qe_low_sat:,} / {len(qe_low):,} = {qe_low_rate:.1f}%")
-    print(f"\n  STRICT QE TOTAL n = {len(qe_high) + len(qe_low):,}")
+    print(f"    n = {qe_low_n:,}")
+    print(f"    Success: {qe_low_sat:,} / {qe_low_n:,} = {qe_low_rate:.1f}%")
+    print(f"\n  STRICT QE TOTAL n = {qe_high_n + qe_low_n:,}")
     print(f"  GAP: {qe_gap:.1f} percentage points")
     print(f"  OR = {OR_qe:.1f} (95% CI: {ci_lo_qe:.1f} – {ci_hi_qe:.1f})")
-    
+
     # ── Step 5b: QE Broad (MS+ vs MU-) ──
     print_section("STEP 5b: QUALITY AT ENTRY - BROAD ANALYSIS")
-    
-    qe_broad_high = [r for r in has_qe_outcome if r['Quality at Entry'].strip() in BROAD_SAT]
-    qe_broad_low = [r for r in has_qe_outcome if r['Quality at Entry'].strip() in BROAD_UNSAT]
-    
-    qe_bh_sat = sum(1 for r in qe_broad_high if r['Outcome'].strip() in BROAD_SAT)
-    qe_bh_unsat = len(qe_broad_high) - qe_bh_sat
-    qe_bl_sat = sum(1 for r in qe_broad_low if r['Outcome'].strip() in BROAD_SAT)
-    qe_bl_unsat = len(qe_broad_low) - qe_bl_sat
-    
-    qe_bh_rate = pct(qe_bh_sat, len(qe_broad_high))
-    qe_bl_rate = pct(qe_bl_sat, len(qe_broad_low))
-    
+
+    qe_is_bh = (qe >= 4) & has_outcome
+    qe_is_bl = (qe >= 1) & (qe <= 3) & has_outcome
+    qe_bh_n = int(qe_is_bh.sum())
+    qe_bl_n = int(qe_is_bl.sum())
+
+    qe_bh_sat = int((qe_is_bh & is_sat).sum())
+    qe_bh_unsat = qe_bh_n - qe_bh_sat
+    qe_bl_sat = int((qe_is_bl & is_sat).sum())
+    qe_bl_unsat = qe_bl_n - qe_bl_sat
+
+    qe_bh_rate = pct(qe_bh_sat, qe_bh_n)
+    qe_bl_rate = pct(qe_bl_sat, qe_bl_n)
+
     OR_qe_b, ci_lo_b, ci_hi_b = odds_ratio(qe_bh_sat, qe_bh_unsat, qe_bl_sat, qe_bl_unsat)
-    
-    print(f"\n  HIGH QE Broad (MS/S/HS): n={len(qe_broad_high):,}, Success={qe_bh_rate:.1f}%")
-    print(f"  LOW QE Broad (MU/U/HU):  n={len(qe_broad_low):,}, Success={qe_bl_rate:.1f}%")
+
+    print(f"\n  HIGH QE Broad (MS/S/HS): n={qe_bh_n:,}, Success={qe_bh_rate:.1f}%")
+    print(f"  LOW QE Broad (MU/U/HU):  n={qe_bl_n:,}, Success={qe_bl_rate:.1f}%")
     print(f"  OR = {OR_qe_b:.1f} (95% CI: {ci_lo_b:.1f} – {ci_hi_b:.1f})")
-    
+
     # ── Step 6: QoS Analysis ──
     print_section("STEP 6: QUALITY OF SUPERVISION - STRICT ANALYSIS")
-    
-    has_qs_outcome = [r for r in rows 
-                      if r.get('Quality of Supervision', '').strip()
-                      and r.get('Outcome', '').strip()]
-    
-    qs_high = [r for r in has_qs_outcome if r['Quality of Supervision'].strip() in SAT_RATINGS]
-    qs_low = [r for r in has_qs_outcome if r['Quality of Supervision'].strip() in UNSAT_RATINGS]
-    
-    qs_high_sat = sum(1 for r in qs_high if r['Outcome'].strip() in BROAD_SAT)
-    qs_high_unsat = len(qs_high) - qs_high_sat
-    qs_low_sat = sum(1 for r in qs_low if r['Outcome'].strip() in BROAD_SAT)
-    qs_low_unsat = len(qs_low) - qs_low_sat
-    
-    qs_high_rate = pct(qs_high_sat, len(qs_high))
-    qs_low_rate = pct(qs_low_sat, len(qs_low))
-    
+
+    qs_is_high = (qos >= 5) & has_outcome
+    qs_is_low = (qos >= 1) & (qos <= 2) & has_outcome
+    qs_high_n = int(qs_is_high.sum())
+    qs_low_n = int(qs_is_low.sum())
+
+    qs_high_sat = int((qs_is_high & is_sat).sum())
+    qs_high_unsat = qs_high_n - qs_high_sat
+    qs_low_sat = int((qs_is_low & is_sat).sum())
+    qs_low_unsat = qs_low_n - qs_low_sat
+
+    qs_high_rate = pct(qs_high_sat, qs_high_n)
+    qs_low_rate = pct(qs_low_sat, qs_low_n)
+
     OR_qs, ci_lo_qs, ci_hi_qs = odds_ratio(qs_high_sat, qs_high_unsat, qs_low_sat, qs_low_unsat)
-    
-    print(f"\n  HIGH QoS (S/HS): n={len(qs_high):,}, Success={qs_high_rate:.1f}%")
-    print(f"  LOW QoS (U/HU):  n={len(qs_low):,}, Success={qs_low_rate:.1f}%")
-    print(f"  STRICT QoS TOTAL n = {len(qs_high) + len(qs_low):,}")
+
+    print(f"\n  HIGH QoS (S/HS): n={qs_high_n:,}, Success={qs_high_rate:.1f}%")
+    print(f"  LOW QoS (U/HU):  n={qs_low_n:,}, Success={qs_low_rate:.1f}%")
+    print(f"  STRICT QoS TOTAL n = {qs_high_n + qs_low_n:,}")
     print(f"  OR = {OR_qs:.1f} (95% CI: {ci_lo_qs:.1f} – {ci_hi_qs:.1f})")
-    
+
     # ── Step 7: M&E Analysis ──
     print_section("STEP 7: M&E QUALITY ANALYSIS")
-    
-    has_me_outcome = [r for r in rows
-                      if r.get('M&E Quality', '').strip()
-                      and r.get('Outcome', '').strip()]
-    
+
     for me_level in ['High', 'Substantial', 'Modest', 'Negligible']:
-        me_group = [r for r in has_me_outcome if r['M&E Quality'].strip() == me_level]
-        me_sat = sum(1 for r in me_group if r['Outcome'].strip() in BROAD_SAT)
-        me_rate = pct(me_sat, len(me_group))
-        print(f"  M&E {me_level:<15} n={len(me_group):>5}, Success={me_sat:>5}/{len(me_group):>5} = {me_rate:.1f}%")
-    
+        me_group = (me == CODE_ME[me_level]) & has_outcome
+        me_n = int(me_group.sum())
+        me_sat = int((me_group & is_sat).sum())
+        me_rate = pct(me_sat, me_n)
+        print(f"  M&E {me_level:<15} n={me_n:>5}, Success={me_sat:>5}/{me_n:>5} = {me_rate:.1f}%")
+
     # ── Step 8: Certification Analysis (QE HIGH + QoS HIGH) ──
     print_section("STEP 8: CERTIFICATION (QE=S/HS AND QoS=S/HS)")
-    
-    has_all = [r for r in rows
-               if r.get('Quality at Entry', '').strip()
-               and r.get('Quality of Supervision', '').strip()
-               and r.get('Outcome', '').strip()]
-    
-    certify = [r for r in has_all 
-               if r['Quality at Entry'].strip() in SAT_RATINGS 
-               and r['Quality of Supervision'].strip() in SAT_RATINGS]
-    reject = [r for r in has_all
-              if r['Quality at Entry'].strip() in UNSAT_RATINGS
-              and r['Quality of Supervision'].strip() in UNSAT_RATINGS]
-    
-    cert_sat = sum(1 for r in certify if r['Outcome'].strip() in BROAD_SAT)
-    cert_rate = pct(cert_sat, len(certify))
-    rej_sat = sum(1 for r in reject if r['Outcome'].strip() in BROAD_SAT)
-    rej_rate = pct(rej_sat, len(reject))
-    
-    print(f"\n  CERTIFY (QE=S/HS & QoS=S/HS): n={len(certify):,}, Success={cert_sat}/{len(certify)} = {cert_rate:.1f}%")
-    print(f"  REJECT  (QE=U/HU & QoS=U/HU): n={len(reject):,}, Success={rej_sat}/{len(reject)} = {rej_rate:.1f}%")
+
+    certify = (qe >= 5) & (qos >= 5) & has_outcome
+    reject = (qe >= 1) & (qe <= 2) & (qos >= 1) & (qos <= 2) & has_outcome
+    certify_n = int(certify.sum())
+    reject_n = int(reject.sum())
+
+    cert_sat = int((certify & is_sat).sum())
+    cert_rate = pct(cert_sat, certify_n)
+    rej_sat = int((reject & is_sat).sum())
+    rej_rate = pct(rej_sat, reject_n)
+
+    print(f"\n  CERTIFY (QE=S/HS & QoS=S/HS): n={certify_n:,}, Success={cert_sat}/{certify_n} = {cert_rate:.1f}%")
+    print(f"  REJECT  (QE=U/HU & QoS=U/HU): n={reject_n:,}, Success={rej_sat}/{reject_n} = {rej_rate:.1f}%")
     print(f"  GAP: {cert_rate - rej_rate:.1f} pp")
-    
-    if len(certify) > 0 and len(reject) > 0:
-        cert_unsat = len(certify) - cert_sat
-        rej_unsat = len(reject) - rej_sat
+
+    if certify_n > 0 and reject_n > 0:
+        cert_unsat = certify_n - cert_sat
+        rej_unsat = reject_n - rej_sat
         OR_cert, ci_lo_c, ci_hi_c = odds_ratio(cert_sat, cert_unsat, rej_sat, rej_unsat)
         print(f"  OR = {OR_cert:.1f} (95% CI: {ci_lo_c:.1f} – {ci_hi_c:.1f})")
-    
+
     # ── Step 9: SIDS Analysis ──
     print_section("STEP 9: SIDS ANALYSIS")
-    
-    sids_projects = [r for r in has_outcome if r.get('Country / Economy', '').strip() in SIDS_COUNTRIES]
-    sids_sat = sum(1 for r in sids_projects if r['Outcome'].strip() in BROAD_SAT)
-    sids_rate = pct(sids_sat, len(sids_projects))
-    
-    pacific_projects = [r for r in has_outcome if r.get('Country / Economy', '').strip() in PACIFIC_COUNTRIES]
-    pac_sat = sum(1 for r in pacific_projects if r['Outcome'].strip() in BROAD_SAT)
-    pac_rate = pct(pac_sat, len(pacific_projects))
-    
-    print(f"\n  ALL SIDS: n={len(sids_projects):,}, Success={sids_sat}/{len(sids_projects)} = {sids_rate:.1f}%")
-    print(f"  PACIFIC:  n={len(pacific_projects):,}, Success={pac_sat}/{len(pacific_projects)} = {pac_rate:.1f}%")
-    
+
+    sids_n = int((sids_flag & has_outcome).sum())
+    sids_sat = int((sids_flag & is_sat).sum())
+    sids_rate = pct(sids_sat, sids_n)
+
+    pac_n = int((pac_flag & has_outcome).sum())
+    pac_sat = int((pac_flag & is_sat).sum())
+    pac_rate = pct(pac_sat, pac_n)
+
+    print(f"\n  ALL SIDS: n={sids_n:,}, Success={sids_sat}/{sids_n} = {sids_rate:.1f}%")
+    print(f"  PACIFIC:  n={pac_n:,}, Success={pac_sat}/{pac_n} = {pac_rate:.1f}%")
+
     # SIDS QE strict
-    sids_qe = [r for r in sids_projects if r.get('Quality at Entry', '').strip()]
-    sids_qe_high = [r for r in sids_qe if r['Quality at Entry'].strip() in SAT_RATINGS]
-    sids_qe_low = [r for r in sids_qe if r['Quality at Entry'].strip() in UNSAT_RATINGS]
-    
-    if sids_qe_high and sids_qe_low:
-        sh_sat = sum(1 for r in sids_qe_high if r['Outcome'].strip() in BROAD_SAT)
-        sh_rate = pct(sh_sat, len(sids_qe_high))
-        sl_sat = sum(1 for r in sids_qe_low if r['Outcome'].strip() in BROAD_SAT)
-        sl_rate = pct(sl_sat, len(sids_qe_low))
-        
-        OR_sids, _, _ = odds_ratio(sh_sat, len(sids_qe_high)-sh_sat, sl_sat, len(sids_qe_low)-sl_sat)
-        print(f"\n  SIDS QE HIGH: n={len(sids_qe_high)}, Success={sh_rate:.1f}%")
-        print(f"  SIDS QE LOW:  n={len(sids_qe_low)}, Success={sl_rate:.1f}%")
+    sids_qe_high = sids_flag & qe_is_high
+    sids_qe_low = sids_flag & qe_is_low
+    sids_qe_high_n = int(sids_qe_high.sum())
+    sids_qe_low_n = int(sids_qe_low.sum())
+
+    if sids_qe_high_n and sids_qe_low_n:
+        sh_sat = int((sids_qe_high & is_sat).sum())
+        sh_rate = pct(sh_sat, sids_qe_high_n)
+        sl_sat = int((sids_qe_low & is_sat).sum())
+        sl_rate = pct(sl_sat, sids_qe_low_n)
+
+        OR_sids, _, _ = odds_ratio(sh_sat, sids_qe_high_n-sh_sat, sl_sat, sids_qe_low_n-sl_sat)
+        print(f"\n  SIDS QE HIGH: n={sids_qe_high_n}, Success={sh_rate:.1f}%")
+        print(f"  SIDS QE LOW:  n={sids_qe_low_n}, Success={sl_rate:.1f}%")
         print(f"  SIDS OR = {OR_sids:.1f}")
-    
+
     # Pacific QE strict
-    pac_qe = [r for r in pacific_projects if r.get('Quality at Entry', '').strip()]
-    pac_qe_high = [r for r in pac_qe if r['Quality at Entry'].strip() in SAT_RATINGS]
-    pac_qe_low = [r for r in pac_qe if r['Quality at Entry'].strip() in UNSAT_RATINGS]
-    
-    if pac_qe_high and pac_qe_low:
-        ph_sat = sum(1 for r in pac_qe_high if r['Outcome'].strip() in BROAD_SAT)
-        ph_rate = pct(ph_sat, len(pac_qe_high))
-        pl_sat = sum(1 for r in pac_qe_low if r['Outcome'].strip() in BROAD_SAT)
-        pl_rate = pct(pl_sat, len(pac_qe_low))
-        
-        OR_pac, _, _ = odds_ratio(ph_sat, len(pac_qe_high)-ph_sat, pl_sat, len(pac_qe_low)-pl_sat)
-        print(f"\n  PACIFIC QE HIGH: n={len(pac_qe_high)}, Success={ph_rate:.1f}%")
-        print(f"  PACIFIC QE LOW:  n={len(pac_qe_low)}, Success={pl_rate:.1f}%")
+    pac_qe_high = pac_flag & qe_is_high
+    pac_qe_low = pac_flag & qe_is_low
+    pac_qe_high_n = int(pac_qe_high.sum())
+    pac_qe_low_n = int(pac_qe_low.sum())
+
+    if pac_qe_high_n and pac_qe_low_n:
+        ph_sat = int((pac_qe_high & is_sat).sum())
+        ph_rate = pct(ph_sat, pac_qe_high_n)
+        pl_sat = int((pac_qe_low & is_sat).sum())
+        pl_rate = pct(pl_sat, pac_qe_low_n)
+
+        OR_pac, _, _ = odds_ratio(ph_sat, pac_qe_high_n-ph_sat, pl_sat, pac_qe_low_n-pl_sat)
+        print(f"\n  PACIFIC QE HIGH: n={pac_qe_high_n}, Success={ph_rate:.1f}%")
+        print(f"  PACIFIC QE LOW:  n={pac_qe_low_n}, Success={pl_rate:.1f}%")
         print(f"  PACIFIC OR = {OR_pac:.1f}")
-    
+
+    # The group analyses in Steps 10-13 (sector, region, decade,
+    # lending/FCS) share one routine, specialised once over the
+    # strict-QE masks already in scope; only the id column, the
+    # small-group cutoff and the row format differ per table. The
+    # reductions are independent of each other and NumPy drops the GIL
+    # inside them, so they run on a thread pool and only the printing
+    # is serial, in step order.
+    def qe_group_stats(ids, n_groups):
+        valid = ids >= 0
+        high_total, high_sat, low_total, low_sat = group_tallies(
+            ids, n_groups, qe_is_high & valid, qe_is_low & valid, is_sat)
+        ors, _, _ = odds_ratio_vec(high_sat, high_total - high_sat,
+                                   low_sat, low_total - low_sat)
+        return high_total, high_sat, low_total, low_sat, ors
+
+    def qe_group_table(stats, names, min_n, print_row):
+        high_total, high_sat, low_total, low_sat, ors = stats
+        for gid in sorted(range(len(names)), key=lambda i: names[i]):
+            h_total, h_sat = int(high_total[gid]), int(high_sat[gid])
+            l_total, l_sat = int(low_total[gid]), int(low_sat[gid])
+            n = h_total + l_total
+            if n < min_n:  # Skip tiny groups
+                continue
+            h_rate = pct(h_sat, h_total)
+            l_rate = pct(l_sat, l_total)
+            print_row(names[gid], n, h_rate, l_rate, f"{ors[gid]:.1f}")
+
+    def wide_row(name, n, h_rate, l_rate, or_str):
+        print(f"  {name:<40} {n:>5} {h_rate:>6.1f}% {l_rate:>6.1f}% {or_str:>8}")
+
+    dec_valid = decade_col >= 1970
+    uniq_decades = np.unique(decade_col[dec_valid])
+    dec_idx = np.searchsorted(uniq_decades, decade_col)
+    dec_idx[~dec_valid] = -1  # excluded like any missing group id
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        fut_sector = pool.submit(qe_group_stats, sector_col, len(sector_names))
+        fut_region = pool.submit(qe_group_stats, region_col, len(region_names))
+        fut_decade = pool.submit(qe_group_stats, dec_idx, len(uniq_decades))
+        fut_lend = pool.submit(qe_group_stats, lend_col, len(lend_names))
+        fut_fcs = pool.submit(qe_group_stats, fcs_col, len(fcs_names))
+
     # ── Step 10: Sector Analysis ──
     print_section("STEP 10: SECTOR ANALYSIS (STRICT QE)")
-    
-    sectors = defaultdict(lambda: {'high_sat': 0, 'high_total': 0, 'low_sat': 0, 'low_total': 0})
-    
-    for r in has_qe_outcome:
-        qe = r['Quality at Entry'].strip()
-        sector = r.get('Global Practice', '').strip() or r.get('Practice Group', '').strip()
-        if not sector:
-            continue
-        outcome_sat = r['Outcome'].strip() in BROAD_SAT
-        
-        if qe in SAT_RATINGS:
-            sectors[sector]['high_total'] += 1
-            if outcome_sat:
-                sectors[sector]['high_sat'] += 1
-        elif qe in UNSAT_RATINGS:
-            sectors[sector]['low_total'] += 1
-            if outcome_sat:
-                sectors[sector]['low_sat'] += 1
-    
+
     print(f"\n  {'Sector':<40} {'n':>5} {'HIGH%':>7} {'LOW%':>7} {'OR':>8}")
     print(f"  {'-'*40} {'---':>5} {'-----':>7} {'-----':>7} {'------':>8}")
-    
-    for sector in sorted(sectors.keys()):
-        s = sectors[sector]
-        n = s['high_total'] + s['low_total']
-        if n < 20:  # Skip tiny sectors
-            continue
-        h_rate = pct(s['high_sat'], s['high_total'])
-        l_rate = pct(s['low_sat'], s['low_total'])
-        
-        h_fail = s['high_total'] - s['high_sat']
-        l_fail = s['low_total'] - s['low_sat']
-        
-        if h_fail > 0 and s['low_sat'] > 0:
-            OR_s, _, _ = odds_ratio(s['high_sat'], h_fail, s['low_sat'], l_fail)
-            or_str = f"{OR_s:.1f}"
-        else:
-            or_str = "∞"
-        
-        print(f"  {sector:<40} {n:>5} {h_rate:>6.1f}% {l_rate:>6.1f}% {or_str:>8}")
-    
+    qe_group_table(fut_sector.result(), sector_names, 20, wide_row)
+
     # ── Step 11: Region Analysis ──
     print_section("STEP 11: REGION ANALYSIS (STRICT QE)")
-    
-    regions = defaultdict(lambda: {'high_sat': 0, 'high_total': 0, 'low_sat': 0, 'low_total': 0})
-    
-    for r in has_qe_outcome:
-        qe = r['Quality at Entry'].strip()
-        region = r.get('WB Region', '').strip()
-        if not region:
-            continue
-        outcome_sat = r['Outcome'].strip() in BROAD_SAT
-        
-        if qe in SAT_RATINGS:
-            regions[region]['high_total'] += 1
-            if outcome_sat:
-                regions[region]['high_sat'] += 1
-        elif qe in UNSAT_RATINGS:
-            regions[region]['low_total'] += 1
-            if outcome_sat:
-                regions[region]['low_sat'] += 1
-    
+
     print(f"\n  {'Region':<40} {'n':>5} {'HIGH%':>7} {'LOW%':>7} {'OR':>8}")
     print(f"  {'-'*40} {'---':>5} {'-----':>7} {'-----':>7} {'------':>8}")
-    
-    for region in sorted(regions.keys()):
-        s = regions[region]
-        n = s['high_total'] + s['low_total']
-        if n < 10:
-            continue
-        h_rate = pct(s['high_sat'], s['high_total'])
-        l_rate = pct(s['low_sat'], s['low_total'])
-        
-        h_fail = s['high_total'] - s['high_sat']
-        l_fail = s['low_total'] - s['low_sat']
-        
-        if h_fail > 0 and s['low_sat'] > 0:
-            OR_r, _, _ = odds_ratio(s['high_sat'], h_fail, s['low_sat'], l_fail)
-            or_str = f"{OR_r:.1f}"
-        else:
-            or_str = "∞"
-        
-        print(f"  {region:<40} {n:>5} {h_rate:>6.1f}% {l_rate:>6.1f}% {or_str:>8}")
-    
+    qe_group_table(fut_region.result(), region_names, 10, wide_row)
+
     # ── Step 12: Decade Analysis ──
     print_section("STEP 12: DECADE ANALYSIS (STRICT QE)")
-    
-    decades = defaultdict(lambda: {'high_sat': 0, 'high_total': 0, 'low_sat': 0, 'low_total': 0})
-    
-    for r in has_qe_outcome:
-        qe = r['Quality at Entry'].strip()
-        try:
-            fy = int(r.get('Approval FY', 0))
-        except (ValueError, TypeError):
-            continue
-        decade = (fy // 10) * 10
-        if decade < 1970:
-            continue
-        outcome_sat = r['Outcome'].strip() in BROAD_SAT
-        
-        if qe in SAT_RATINGS:
-            decades[decade]['high_total'] += 1
-            if outcome_sat:
-                decades[decade]['high_sat'] += 1
-        elif qe in UNSAT_RATINGS:
-            decades[decade]['low_total'] += 1
-            if outcome_sat:
-                decades[decade]['low_sat'] += 1
-    
+
     print(f"\n  {'Decade':<15} {'n':>5} {'HIGH%':>7} {'LOW%':>7} {'OR':>8}")
     print(f"  {'-'*15} {'---':>5} {'-----':>7} {'-----':>7} {'------':>8}")
-    
-    for decade in sorted(decades.keys()):
-        s = decades[decade]
-        n = s['high_total'] + s['low_total']
-        if n < 10:
-            continue
-        h_rate = pct(s['high_sat'], s['high_total'])
-        l_rate = pct(s['low_sat'], s['low_total'])
-        
-        h_fail = s['high_total'] - s['high_sat']
-        l_fail = s['low_total'] - s['low_sat']
-        
-        if h_fail > 0 and s['low_sat'] > 0:
-            OR_d, _, _ = odds_ratio(s['high_sat'], h_fail, s['low_sat'], l_fail)
-            or_str = f"{OR_d:.1f}"
-        else:
-            or_str = "∞"
-        
-        print(f"  {str(decade)+'s':<15} {n:>5} {h_rate:>6.1f}% {l_rate:>6.1f}% {or_str:>8}")
-    
+    qe_group_table(fut_decade.result(), uniq_decades, 10,
+                   lambda decade, n, h_rate, l_rate, or_str: print(
+                       f"  {str(decade)+'s':<15} {n:>5} {h_rate:>6.1f}% {l_rate:>6.1f}% {or_str:>8}"))
+
     # ── Step 13: Income/FCS Analysis ──
     print_section("STEP 13: INCOME GROUP & FCS ANALYSIS (STRICT QE)")
-    
-    for group_col, group_name in [('Country / Economy Lending Group', 'Lending Group'),
-                                    ('Country / Economy FCS Status', 'FCS Status')]:
-        groups = defaultdict(lambda: {'high_sat': 0, 'high_total': 0, 'low_sat': 0, 'low_total': 0})
-        
-        for r in has_qe_outcome:
-            qe = r['Quality at Entry'].strip()
-            grp = r.get(group_col, '').strip()
-            if not grp:
-                continue
-            outcome_sat = r['Outcome'].strip() in BROAD_SAT
-            
-            if qe in SAT_RATINGS:
-                groups[grp]['high_total'] += 1
-                if outcome_sat:
-                    groups[grp]['high_sat'] += 1
-            elif qe in UNSAT_RATINGS:
-                groups[grp]['low_total'] += 1
-                if outcome_sat:
-                    groups[grp]['low_sat'] += 1
-        
+
+    for fut_group, group_names, group_name in [(fut_lend, lend_names, 'Lending Group'),
+                                               (fut_fcs, fcs_names, 'FCS Status')]:
         print(f"\n  {group_name}:")
-        for grp in sorted(groups.keys()):
-            s = groups[grp]
-            n = s['high_total'] + s['low_total']
-            if n < 5:
-                continue
-            h_rate = pct(s['high_sat'], s['high_total'])
-            l_rate = pct(s['low_sat'], s['low_total'])
-            h_fail = s['high_total'] - s['high_sat']
-            l_fail = s['low_total'] - s['low_sat']
-            if h_fail > 0 and s['low_sat'] > 0:
-                OR_g, _, _ = odds_ratio(s['high_sat'], h_fail, s['low_sat'], l_fail)
-                or_str = f"{OR_g:.1f}"
-            else:
-                or_str = "∞"
-            print(f"    {grp:<35} n={n:>5}, HIGH={h_rate:.1f}%, LOW={l_rate:.1f}%, OR={or_str}")
-    
+        qe_group_table(fut_group.result(), group_names, 5,
+                       lambda name, n, h_rate, l_rate, or_str: print(
+                           f"    {name:<35} n={n:>5}, HIGH={h_rate:.1f}%, LOW={l_rate:.1f}%, OR={or_str}"))
+
     # ── Step 14: QAE + M&E Combined Score ──
     print_section("STEP 14: QAE + M&E COMBINED SCORE (TIER 1)")
-    
-    qae_map = {
-        'Highly Satisfactory': 5, 'Satisfactory': 4, 'Moderately Satisfactory': 3,
-        'Moderately Unsatisfactory': 2, 'Unsatisfactory': 1, 'Highly Unsatisfactory': 1
-    }
-    me_map = {
-        'High': 5, 'Substantial': 4, 'Modest': 3, 'Modest ': 3,
-        'Negligible': 2, 'Not Applicable': 1
-    }
-    
-    has_both = [r for r in rows
-                if r.get('Quality at Entry', '').strip() in qae_map
-                and r.get('M&E Quality', '').strip() in me_map
-                and r.get('Outcome', '').strip()]
-    
-    score_bins = defaultdict(lambda: {'sat': 0, 'total': 0})
-    for r in has_both:
-        qae_score = qae_map[r['Quality at Entry'].strip()]
-        me_score = me_map[r['M&E Quality'].strip()]
-        combined = qae_score + me_score
-        outcome_sat = r['Outcome'].strip() in BROAD_SAT
-        score_bins[combined]['total'] += 1
-        if outcome_sat:
-            score_bins[combined]['sat'] += 1
-    
+
+    # QAE contribution from the rating code: HS=5, S=4, MS=3, MU=2, U=1,
+    # HU=1 (i.e. max(code-1, 1)); the M&E code is already the score.
+    # 'Not Rated' (code 0) is excluded from both, as before.
+    tier1 = (qe >= 1) & (me >= 1) & has_outcome
+    combined = np.maximum(qe, 2).astype(np.int16) - 1 + me
+    score_totals = Counter(combined[tier1].tolist())
+    score_sats = Counter(combined[tier1 & is_sat].tolist())
+
     print(f"\n  {'Score':<8} {'n':>6} {'Success':>8} {'Rate':>8}")
     print(f"  {'-'*8} {'---':>6} {'-------':>8} {'----':>8}")
     total_tier1 = 0
-    for score in sorted(score_bins.keys()):
-        s = score_bins[score]
-        rate = pct(s['sat'], s['total'])
-        print(f"  {score:<8} {s['total']:>6} {s['sat']:>8} {rate:>7.1f}%")
-        total_tier1 += s['total']
+    for score in sorted(score_totals.keys()):
+        n_score = score_totals[score]
+        n_score_sat = score_sats[score]
+        rate = pct(n_score_sat, n_score)
+        print(f"  {score:<8} {n_score:>6} {n_score_sat:>8} {rate:>7.1f}%")
+        total_tier1 += n_score
     print(f"  {'TOTAL':<8} {total_tier1:>6}")
-    
+
     # ── SUMMARY ──
     print_section("SUMMARY: CORRECTED CANONICAL NUMBERS")
-    
+
     print(f"""
   ┌──────────────────────────────────────────────────────────────┐
   │ THESE ARE THE TRUE NUMBERS FROM THE IEG DATASET             │
@@ -641,24 +746,24 @@ def main():
   Overall success rate:        {pct(n_sat, n_rated):>7.1f}%
   
   QE STRICT (S/HS vs U/HU):
-    n =                        {len(qe_high) + len(qe_low):>8,}
-    HIGH QE success:           {qe_high_rate:>7.1f}%  (n={len(qe_high):,})
-    LOW QE success:            {qe_low_rate:>7.1f}%  (n={len(qe_low):,})
+    n =                        {qe_high_n + qe_low_n:>8,}
+    HIGH QE success:           {qe_high_rate:>7.1f}%  (n={qe_high_n:,})
+    LOW QE success:            {qe_low_rate:>7.1f}%  (n={qe_low_n:,})
     GAP:                       {qe_gap:>7.1f} pp
     OR:                        {OR_qe:>7.1f}  (CI: {ci_lo_qe:.1f}–{ci_hi_qe:.1f})
   
   QoS STRICT (S/HS vs U/HU):
-    HIGH QoS success:          {qs_high_rate:>7.1f}%  (n={len(qs_high):,})
-    LOW QoS success:           {qs_low_rate:>7.1f}%  (n={len(qs_low):,})
+    HIGH QoS success:          {qs_high_rate:>7.1f}%  (n={qs_high_n:,})
+    LOW QoS success:           {qs_low_rate:>7.1f}%  (n={qs_low_n:,})
   
   CERTIFICATION (QE=S/HS & QoS=S/HS):
-    CERTIFY success:           {cert_rate:>7.1f}%  (n={len(certify):,})
-    REJECT success:            {rej_rate:>7.1f}%  (n={len(reject):,})
+    CERTIFY success:           {cert_rate:>7.1f}%  (n={certify_n:,})
+    REJECT success:            {rej_rate:>7.1f}%  (n={reject_n:,})
   
-  SIDS: n={len(sids_projects):,}, success={sids_rate:.1f}%
-  PACIFIC: n={len(pacific_projects):,}, success={pac_rate:.1f}%
+  SIDS: n={sids_n:,}, success={sids_rate:.1f}%
+  PACIFIC: n={pac_n:,}, success={pac_rate:.1f}%
 """)
-    
+
     print("  SCRIPT COMPLETE. Use these numbers in all papers and documents.")
     print(f"  {'='*60}")
 